@@ -1,22 +1,49 @@
 import os
+import shutil
+import tempfile
 import time
+import asyncio
 import uuid
 import json
-from typing import List, Dict, Any, Literal
+import logging
+import contextlib
+import functools
+import itertools
+import threading
+import multiprocessing
+import concurrent.futures
+from typing import List, Dict, Any, Callable, Iterator, Literal, NamedTuple, Optional
+from types import CodeType
+from collections import OrderedDict
 from pathlib import Path
 
-from fastapi import FastAPI, HTTPException, Response, UploadFile, File, BackgroundTasks
+from fastapi import FastAPI, HTTPException, UploadFile, File, BackgroundTasks
+from fastapi.responses import FileResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel, Field
 from dotenv import load_dotenv
 import jinja2
+import orjson
+import httpx
 
 from llama_index.llms.openai import OpenAI
 from llama_index.llms.anthropic import Anthropic
 from llama_index.llms.google_genai import GoogleGenAI
 from llama_index.core.prompts import PromptTemplate
+from llama_index.core.base.llms.types import CompletionResponse
 
-app = FastAPI(title="Template Explorer API")
+logger = logging.getLogger(__name__)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Start loading configured local models in the background so the first request doesn't pay for it
+    preload_tasks = _start_vllm_preload()
+    yield
+    for task in preload_tasks:
+        task.cancel()
+
+app = FastAPI(title="Template Explorer API", lifespan=lifespan)
 
 
 def _resolve_workspace_root() -> Path:
@@ -36,14 +63,172 @@ load_dotenv(dotenv_path=STORAGE_ROOT / ".env", override=True)
 TEMPLATES_DIR = STORAGE_ROOT / "templates"
 DATASETS_DIR = STORAGE_ROOT / "datasets"
 RESULTS_DIR = STORAGE_ROOT / "results"
+# Results of running and unsaved jobs; moved into RESULTS_DIR when a job is saved
+PARTIAL_RESULTS_DIR = RESULTS_DIR / ".partial"
 
 # Ensure directories exist
 TEMPLATES_DIR.mkdir(parents=True, exist_ok=True)
 DATASETS_DIR.mkdir(parents=True, exist_ok=True)
 RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+PARTIAL_RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+
+# How long finished jobs (and their unsaved results) are kept
+JOB_TTL_SECONDS = int(os.getenv("JOB_TTL_SECONDS", str(24 * 3600)))
+
+class JobStore:
+    """Batch job status store.
+
+    Jobs live in process memory by default. When REDIS_URL is set they are kept
+    in Redis hashes (one per job, expiring after JOB_TTL_SECONDS) so that every
+    API worker sees the same jobs and they survive restarts. Only status and
+    counters are stored; per-record results are streamed to a JSONL file under
+    RESULTS_DIR.
+    """
+
+    def __init__(self, redis_url: str | None = None, ttl_seconds: int = 24 * 3600):
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._ttl_seconds = ttl_seconds
+        self._redis = None
+        if redis_url:
+            import redis.asyncio as redis  # Optional dependency, only needed with REDIS_URL
+            self._redis = redis.from_url(redis_url)
+
+    @staticmethod
+    def _key(job_id: str) -> str:
+        return f"job:{job_id}"
+
+    async def set(self, job_id: str, data: Dict[str, Any]) -> None:
+        if self._redis is None:
+            self._jobs[job_id] = dict(data)
+            return
+        key = self._key(job_id)
+        async with self._redis.pipeline() as pipe:
+            pipe.delete(key)
+            pipe.hset(key, mapping={k: orjson.dumps(v) for k, v in data.items()})
+            pipe.expire(key, self._ttl_seconds)
+            await pipe.execute()
+
+    async def update(self, job_id: str, **fields: Any) -> None:
+        if self._redis is None:
+            self._jobs[job_id].update(fields)
+            return
+        key = self._key(job_id)
+        async with self._redis.pipeline() as pipe:
+            pipe.hset(key, mapping={k: orjson.dumps(v) for k, v in fields.items()})
+            # Keep long-running jobs alive (and never leave a key without a TTL)
+            pipe.expire(key, self._ttl_seconds)
+            await pipe.execute()
+
+    async def incr(self, job_id: str, field: str, amount: int = 1) -> None:
+        if self._redis is None:
+            self._jobs[job_id][field] += amount
+            return
+        key = self._key(job_id)
+        async with self._redis.pipeline() as pipe:
+            pipe.hincrby(key, field, amount)
+            pipe.expire(key, self._ttl_seconds)
+            await pipe.execute()
+
+    async def get(self, job_id: str) -> Dict[str, Any] | None:
+        if self._redis is None:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+        data = await self._redis.hgetall(self._key(job_id))
+        if not data:
+            return None
+        return {k.decode(): orjson.loads(v) for k, v in data.items()}
+
+
+job_store = JobStore(os.getenv("REDIS_URL"), ttl_seconds=JOB_TTL_SECONDS)
+
+# Shared Jinja environment; compiled templates are cached in _compile_template
+JINJA_ENV = jinja2.Environment(auto_reload=False)
+JINJA_ENV.filters['numlines'] = lambda value: '\n'.join([f"{i+1}: {line}" for i, line in enumerate(value.split('\n'))])
+
+# Maximum number of LLM requests a batch job keeps in flight at once
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "32"))
+
+# Batch progress is written to the job store every N records or after this many seconds
+PROGRESS_FLUSH_EVERY = 32
+PROGRESS_FLUSH_INTERVAL = 0.1
+
+# Optional cap on LLM requests per minute across all runs (0 disables it)
+LLM_RPM = float(os.getenv("LLM_RPM", "0"))
+
+# Worker processes used to render prompts (0 renders in the API process)
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", "0"))
+
+# Local models that may be served by the 'vllm' provider (comma-separated);
+# each one gets its own engine, loaded in the background at startup. The engines
+# share the GPU, so VLLM_GPU_MEMORY_UTILIZATION is split evenly between them.
+VLLM_MODELS = [m.strip() for m in os.getenv("VLLM_MODELS", "").split(",") if m.strip()]
+VLLM_GPU_MEMORY_UTILIZATION = float(os.getenv("VLLM_GPU_MEMORY_UTILIZATION", "0.9"))
+
+# Uploads are copied to disk in chunks of this size, up to MAX_UPLOAD_BYTES in total
+UPLOAD_CHUNK_SIZE = 1 << 20
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(512 << 20)))
+# Allowance for multipart framing on top of the file itself when limiting the request body
+UPLOAD_BODY_OVERHEAD = 64 << 10
+
+# Total size (on disk) of parsed datasets kept in memory between requests, per process.
+# Parsed records take several times their file size (about 6x for typical JSONL).
+DATASET_CACHE_BYTES = int(os.getenv("DATASET_CACHE_BYTES", str(32 << 20)))
+
+
+class UploadLimitMiddleware:
+    """Rejects dataset uploads over the size limit while the body is still being received.
+
+    Starlette spools the whole multipart body to disk before the endpoint runs, so the
+    limit has to be enforced at the ASGI level: by Content-Length when the client sends
+    one, otherwise by counting the bytes as they arrive.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] != "/api/datasets":
+            await self.app(scope, receive, send)
+            return
+
+        max_body = MAX_UPLOAD_BYTES + UPLOAD_BODY_OVERHEAD
+        too_large = JSONResponse(
+            {"detail": f"Dataset exceeds the {MAX_UPLOAD_BYTES} byte upload limit."}, status_code=413
+        )
+        content_length = dict(scope["headers"]).get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > max_body:
+            await too_large(scope, receive, send)
+            return
+
+        received = 0
+        rejected = False
+
+        async def limited_receive():
+            nonlocal received, rejected
+            if rejected:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_body:
+                    # Answer now and make the app see a disconnect so it stops reading
+                    rejected = True
+                    await too_large(scope, receive, send)
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message):
+            if not rejected:
+                await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            # The app fails on the simulated disconnect; the 413 has already been sent
+            if not rejected:
+                raise
 
-# In-memory job store (for simplicity)
-job_store: Dict[str, Dict[str, Any]] = {}
+app.add_middleware(UploadLimitMiddleware)
 
 # --- Pydantic Models ---
 
@@ -53,7 +238,7 @@ class TemplateMeta(BaseModel):
 
 
 class LLMConfig(BaseModel):
-    provider: Literal["openai", "anthropic", "google"] = "openai"
+    provider: Literal["openai", "anthropic", "google", "vllm"] = "openai"
     model: str = "o4-mini"
     temperature: float = 0.7
 
@@ -138,6 +323,68 @@ class SaveResultsRequest(BaseModel):
     filename: str
 
 
+# --- Storage Index ---
+
+# Lazily rebuilt {id: Path} and {name: id} maps of the storage directories, so
+# lookups don't have to scan the directory on every request.
+_INDEX_DIRS = {"templates": TEMPLATES_DIR, "datasets": DATASETS_DIR}
+_INDEX_SUFFIXES = {"templates": {".json"}, "datasets": {".json", ".jsonl", ".txt"}}
+_indexes: Dict[str, Dict[str, Any]] = {
+    kind: {"mtime": None, "by_id": {}, "by_name": {}} for kind in _INDEX_DIRS
+}
+
+def _refresh(kind: Literal["templates", "datasets"]) -> Dict[str, Any]:
+    """Returns the index for a storage directory, rebuilding it if the directory changed."""
+    directory = _INDEX_DIRS[kind]
+    index = _indexes[kind]
+    mtime = directory.stat().st_mtime_ns
+    if index["mtime"] != mtime:
+        by_id: Dict[str, Path] = {}
+        by_name: Dict[str, str] = {}
+        for f in sorted(directory.iterdir()):
+            if f.is_file() and f.suffix in _INDEX_SUFFIXES[kind]:
+                try:
+                    item_id, item_name = f.stem.split('__', 1)
+                except ValueError:
+                    # Skip files that don't match the "id__name" format
+                    continue
+                by_id[item_id] = f
+                by_name[item_name] = item_id
+        index.update(mtime=mtime, by_id=by_id, by_name=by_name)
+    return index
+
+def _invalidate(kind: Literal["templates", "datasets"]) -> None:
+    """Forces a rebuild on next access (directory mtime may not tick between quick writes)."""
+    _indexes[kind]["mtime"] = None
+
+
+# Blocking file helpers, run via asyncio.to_thread so disk I/O stays off the event loop
+def _move_no_overwrite(src: Path, dst: Path) -> None:
+    # link() fails with FileExistsError instead of replacing an existing target
+    os.link(src, dst)
+    src.unlink()
+
+def _copy_no_overwrite(src: Path, dst: Path) -> None:
+    with open(src, "rb") as f_in, open(dst, "xb") as f_out:
+        shutil.copyfileobj(f_in, f_out)
+
+def _read_json_file(file_path: Path) -> Any:
+    with open(file_path, "r") as f:
+        return json.load(f)
+
+def _write_json_file(file_path: Path, data: Any) -> None:
+    # Write to a temporary file and swap it in, so readers never see a partial file
+    # and concurrent writers of the same file each use their own temporary file
+    fd, tmp_name = tempfile.mkstemp(dir=file_path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_name, file_path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+
+
 # --- Template CRUD Endpoints ---
 
 @app.post("/api/templates", response_model=TemplateMeta)
@@ -152,16 +399,15 @@ async def create_template(template_in: TemplateCreate):
     file_path = TEMPLATES_DIR / f"{template_id}__{template_name}.json"
 
     # Check for name collision
-    for f in TEMPLATES_DIR.iterdir():
-        if f.is_file() and f.stem.split('__', 1)[1] == template_name:
-            raise HTTPException(status_code=409, detail=f"A template with name '{template_name}' already exists.")
+    if template_name in _refresh("templates")["by_name"]:
+        raise HTTPException(status_code=409, detail=f"A template with name '{template_name}' already exists.")
 
     try:
-        with open(file_path, "w") as f:
-            template_data = template_in.model_dump()
-            json.dump(template_data, f, indent=2)
+        await asyncio.to_thread(_write_json_file, file_path, template_in.model_dump())
     except IOError as e:
         raise HTTPException(status_code=500, detail=f"Failed to write template to disk: {e}")
+    finally:
+        _invalidate("templates")
 
     return TemplateMeta(id=template_id, name=template_name)
 
@@ -170,14 +416,9 @@ async def list_templates():
     """Lists all available templates."""
     templates = []
     print(TEMPLATES_DIR)
-    for f in sorted(TEMPLATES_DIR.iterdir()):
-        if f.is_file() and f.suffix == '.json':
-            try:
-                template_id, template_name = f.stem.split('__', 1)
-                templates.append(TemplateMeta(id=template_id, name=template_name))
-            except ValueError:
-                # Skip files that don't match the "id__name" format
-                continue
+    for template_id, f in _refresh("templates")["by_id"].items():
+        _, template_name = f.stem.split('__', 1)
+        templates.append(TemplateMeta(id=template_id, name=template_name))
     return templates
 
 # --- Dataset CRUD Endpoints ---
@@ -185,15 +426,10 @@ async def list_templates():
 async def list_datasets():
     """Lists all available datasets."""
     datasets = []
-    for f in sorted(DATASETS_DIR.iterdir()):
-        if f.is_file() and f.suffix in ['.json', '.jsonl', '.txt']:
-            try:
-                dataset_id, dataset_name = f.stem.split('__', 1)
-                file_format = f.suffix.lstrip('.')
-                datasets.append(DatasetMeta(id=dataset_id, name=dataset_name, file_format=file_format))
-            except ValueError:
-                print(f"Skipping file {f} because it doesn't match the expected format.")
-                continue
+    for dataset_id, f in _refresh("datasets")["by_id"].items():
+        _, dataset_name = f.stem.split('__', 1)
+        file_format = f.suffix.lstrip('.')
+        datasets.append(DatasetMeta(id=dataset_id, name=dataset_name, file_format=file_format))
     return datasets
 
 @app.post("/api/datasets", response_model=DatasetMeta)
@@ -212,44 +448,95 @@ async def create_dataset(file: UploadFile = File(...)):
         raise HTTPException(status_code=400, detail="Only .json and .jsonl files are allowed.")
 
     # Check for name collision
-    for f in DATASETS_DIR.iterdir():
-        if f.is_file() and f.stem.split('__', 1)[1] == dataset_name:
-            raise HTTPException(status_code=409, detail=f"A dataset with name '{dataset_name}' already exists.")
+    if dataset_name in _refresh("datasets")["by_name"]:
+        raise HTTPException(status_code=409, detail=f"A dataset with name '{dataset_name}' already exists.")
 
     dataset_id = str(uuid.uuid4())
     file_path = DATASETS_DIR / f"{dataset_id}__{dataset_name}{suffix}"
     file_format = suffix.lstrip('.')
 
     try:
-        with open(file_path, "wb") as buffer:
-            buffer.write(await file.read())
+        total_bytes = 0
+        buffer = await asyncio.to_thread(open, file_path, "wb")
+        try:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                total_bytes += len(chunk)
+                if total_bytes > MAX_UPLOAD_BYTES:
+                    break
+                await asyncio.to_thread(buffer.write, chunk)
+        finally:
+            await asyncio.to_thread(buffer.close)
+        # UploadLimitMiddleware allows for multipart framing, so the file itself is checked here
+        if total_bytes > MAX_UPLOAD_BYTES:
+            await asyncio.to_thread(file_path.unlink)
+            raise HTTPException(status_code=413, detail=f"Dataset exceeds the {MAX_UPLOAD_BYTES} byte upload limit.")
     except IOError as e:
         raise HTTPException(status_code=500, detail=f"Failed to write dataset to disk: {e}")
+    finally:
+        _invalidate("datasets")
 
     return DatasetMeta(id=dataset_id, name=dataset_name, file_format=file_format)
 
 
 def _find_dataset_file(dataset_id: str) -> Path | None:
     """Helper to find a dataset file by its ID."""
-    for f in DATASETS_DIR.iterdir():
-        if f.is_file() and f.stem.startswith(f"{dataset_id}__"):
-            return f
-    return None
+    return _refresh("datasets")["by_id"].get(dataset_id)
+
+# LRU cache of parsed datasets: {path: (mtime_ns, size, records)}, bounded by the
+# total on-disk size of the cached files; files above the budget are never cached
+_dataset_cache: "OrderedDict[str, tuple[int, int, list]]" = OrderedDict()
+_dataset_cache_bytes = 0
+_dataset_cache_lock = threading.Lock()
 
 def _load_dataset_file(file_path: Path) -> list[dict] | list[str]:
+    """Loads a dataset file, reusing the parsed records while the file is unchanged."""
+    try:
+        stat = file_path.stat()
+    except OSError as e:
+        raise HTTPException(status_code=500, detail=f"Error reading or parsing dataset file: {e}")
+    return _load_dataset_cached(str(file_path), stat.st_mtime_ns, stat.st_size)
+
+def _load_dataset_cached(path_str: str, mtime_ns: int, size: int) -> list[dict] | list[str]:
+    # mtime_ns and size are stored with the entry, so edits invalidate it
+    global _dataset_cache_bytes
+    with _dataset_cache_lock:
+        entry = _dataset_cache.get(path_str)
+        if entry is not None and entry[:2] == (mtime_ns, size):
+            _dataset_cache.move_to_end(path_str)
+            return entry[2]
+    records = _parse_dataset_file(Path(path_str))
+    if size > DATASET_CACHE_BYTES:
+        return records
+    with _dataset_cache_lock:
+        old = _dataset_cache.pop(path_str, None)
+        if old is not None:
+            _dataset_cache_bytes -= old[1]
+        _dataset_cache[path_str] = (mtime_ns, size, records)
+        _dataset_cache_bytes += size
+        while _dataset_cache_bytes > DATASET_CACHE_BYTES:
+            _, (_, evicted_size, _) = _dataset_cache.popitem(last=False)
+            _dataset_cache_bytes -= evicted_size
+    return records
+
+def _evict_dataset(file_path: Path) -> None:
+    """Drops a dataset's parsed records from the cache."""
+    global _dataset_cache_bytes
+    with _dataset_cache_lock:
+        entry = _dataset_cache.pop(str(file_path), None)
+        if entry is not None:
+            _dataset_cache_bytes -= entry[1]
+
+def _parse_dataset_file(file_path: Path) -> list[dict] | list[str]:
     try:
         ret = []
         if file_path.suffix == '.jsonl':
-            with file_path.open('r') as f:
-                for i, line in enumerate(f):
-                    ret.append(json.loads(line))
+            ret = [orjson.loads(line) for line in file_path.read_bytes().splitlines() if line.strip()]
         elif file_path.suffix == '.json':
-            with file_path.open('r') as f:
-                data = json.load(f)
-                if isinstance(data, list):
-                    ret = data
-                elif isinstance(data, dict):
-                     ret = [data] # It is a single JSON object.
+            data = orjson.loads(file_path.read_bytes())
+            if isinstance(data, list):
+                ret = data
+            elif isinstance(data, dict):
+                 ret = [data] # It is a single JSON object.
         elif file_path.suffix == '.txt':
             with file_path.open('r') as f:
                 ret = [f.read()]
@@ -259,6 +546,35 @@ def _load_dataset_file(file_path: Path) -> list[dict] | list[str]:
         raise HTTPException(status_code=500, detail=f"Error reading or parsing dataset file: {e}")
     return ret
 
+def _iter_dataset_file(file_path: Path) -> Iterator[dict | str]:
+    """Yields dataset records lazily; JSONL files are only read up to the last record consumed."""
+    if file_path.suffix != '.jsonl':
+        yield from _load_dataset_file(file_path)
+        return
+    try:
+        with file_path.open('rb') as f:
+            for line in f:
+                if line.strip():
+                    yield orjson.loads(line)
+    except (IOError, json.JSONDecodeError) as e:
+        raise HTTPException(status_code=500, detail=f"Error reading or parsing dataset file: {e}")
+
+def _get_dataset_row(file_path: Path, row: int) -> dict | str | None:
+    """Returns a single record by index without materializing the whole dataset, or None if out of range."""
+    if row < 0:
+        return None
+    return next(itertools.islice(_iter_dataset_file(file_path), row, None), None)
+
+def _count_dataset_records(file_path: Path) -> int:
+    """Counts records; for JSONL this counts non-blank lines without parsing them."""
+    if file_path.suffix != '.jsonl':
+        return len(_load_dataset_file(file_path))
+    try:
+        with file_path.open('rb') as f:
+            return sum(1 for line in f if line.strip())
+    except IOError as e:
+        raise HTTPException(status_code=500, detail=f"Error reading or parsing dataset file: {e}")
+
 
 @app.get("/api/datasets/{dataset_id}", response_model=DatasetMeta)
 async def get_dataset(dataset_id: str):
@@ -269,8 +585,8 @@ async def get_dataset(dataset_id: str):
 
     _, dataset_name = file_path.stem.split('__', 1)
     file_format = file_path.suffix.lstrip('.')
-    data = _load_dataset_file(file_path)
-    return DatasetMeta(id=dataset_id, name=dataset_name, file_format=file_format, num_records=len(data))
+    num_records = await asyncio.to_thread(_count_dataset_records, file_path)
+    return DatasetMeta(id=dataset_id, name=dataset_name, file_format=file_format, num_records=num_records)
 
 @app.get("/api/datasets/{dataset_id}/records/{record_index}", response_model=dict | str)
 async def get_dataset_record(dataset_id: str, record_index: int):
@@ -279,12 +595,23 @@ async def get_dataset_record(dataset_id: str, record_index: int):
     if not file_path or not file_path.is_file():
         raise HTTPException(status_code=404, detail="Dataset not found")
 
-    data = _load_dataset_file(file_path)
+    data = await asyncio.to_thread(_load_dataset_file, file_path)
     if 0 <= record_index < len(data):
         return data[record_index]
     raise HTTPException(status_code=404, detail="Record not found at that index.")
 
 
+@app.get("/api/datasets/{dataset_id}/download")
+async def download_dataset(dataset_id: str):
+    """Downloads the raw dataset file."""
+    file_path = _find_dataset_file(dataset_id)
+    if not file_path or not file_path.is_file():
+        raise HTTPException(status_code=404, detail="Dataset not found")
+
+    _, dataset_name = file_path.stem.split('__', 1)
+    return FileResponse(file_path, filename=f"{dataset_name}{file_path.suffix}")
+
+
 @app.delete("/api/datasets/{dataset_id}", status_code=204)
 async def delete_dataset(dataset_id: str):
     """Deletes a dataset from the filesystem."""
@@ -296,15 +623,15 @@ async def delete_dataset(dataset_id: str):
         file_path.unlink()
     except IOError as e:
         raise HTTPException(status_code=500, detail=f"Failed to delete dataset file: {e}")
+    finally:
+        _invalidate("datasets")
+        _evict_dataset(file_path)
     return
 
 
 def _find_template_file(template_id: str) -> Path | None:
     """Helper to find a template file by its ID."""
-    for f in TEMPLATES_DIR.iterdir():
-        if f.is_file() and f.stem.startswith(f"{template_id}__") and f.suffix == '.json':
-            return f
-    return None
+    return _refresh("templates")["by_id"].get(template_id)
 
 @app.get("/api/templates/{template_id}", response_model=Template)
 async def get_template(template_id: str):
@@ -314,9 +641,8 @@ async def get_template(template_id: str):
         raise HTTPException(status_code=404, detail="Template not found")
 
     try:
-        with open(file_path, "r") as f:
-            data = json.load(f)
-            return Template(id=template_id, **data)
+        data = await asyncio.to_thread(_read_json_file, file_path)
+        return Template(id=template_id, **data)
     except (IOError, json.JSONDecodeError) as e:
         raise HTTPException(status_code=500, detail=f"Failed to read or parse template file: {e}")
 
@@ -329,8 +655,7 @@ async def update_template(template_id: str, template_in: TemplateUpdate):
 
     # Read existing data
     try:
-        with open(file_path, "r") as f:
-            existing_data = json.load(f)
+        existing_data = await asyncio.to_thread(_read_json_file, file_path)
     except (IOError, json.JSONDecodeError) as e:
         raise HTTPException(status_code=500, detail=f"Failed to read template file: {e}")
 
@@ -346,18 +671,23 @@ async def update_template(template_id: str, template_in: TemplateUpdate):
     if "/" in new_name or "\\" in new_name:
         raise HTTPException(status_code=400, detail="Template name cannot contain slashes.")
 
+    # Check for name collision with a different template
+    existing_id = _refresh("templates")["by_name"].get(new_name)
+    if existing_id is not None and existing_id != template_id:
+        raise HTTPException(status_code=409, detail=f"A template with name '{new_name}' already exists.")
+
     new_file_path = TEMPLATES_DIR / f"{template_id}__{new_name}.json"
 
-    # Write the updated data back
+    # Write the updated data back in place, then rename if the name changed. Both
+    # steps are atomic, so there is never more than one file for this template.
     try:
-        with open(new_file_path, "w") as f:
-            json.dump(updated_template.model_dump(exclude={"id"}), f, indent=2)
+        await asyncio.to_thread(_write_json_file, file_path, updated_template.model_dump(exclude={"id"}))
+        if file_path != new_file_path:
+            await asyncio.to_thread(os.rename, file_path, new_file_path)
     except IOError as e:
         raise HTTPException(status_code=500, detail=f"Failed to write updated template: {e}")
-
-    # If the name changed, remove the old file
-    if file_path != new_file_path:
-        file_path.unlink()
+    finally:
+        _invalidate("templates")
 
     return updated_template
 
@@ -372,73 +702,191 @@ async def delete_template(template_id: str):
         file_path.unlink()
     except IOError as e:
         raise HTTPException(status_code=500, detail=f"Failed to delete template file: {e}")
+    finally:
+        _invalidate("templates")
 
-def execute_llm_run(request: RunRequest, record: Dict[str, Any] | None) -> Dict[str, Any]:
+_next_llm_slot = 0.0
+
+async def _throttle_llm_call() -> None:
+    """Spaces LLM calls at least 60 / LLM_RPM seconds apart when LLM_RPM is set."""
+    global _next_llm_slot
+    if LLM_RPM <= 0:
+        return
+    now = time.monotonic()
+    slot = max(now, _next_llm_slot)
+    _next_llm_slot = slot + 60 / LLM_RPM
+    if slot > now:
+        await asyncio.sleep(slot - now)
+
+class PreparedRun(NamedTuple):
+    """Everything about a run that doesn't depend on the current record."""
+    template_content: str
+    template: jinja2.Template
+    # (context_key, scope, value) per binding, in binding order. For record-scoped
+    # bindings the value is the fallback used when no record is passed in.
+    context_parts: List[tuple[str, str, Any]]
+    llm: Any
+    # Set for the 'structured' and 'python' parsers respectively
+    output_model: type[BaseModel] | None
+    parse_func: Callable[[str], Any] | None
+
+_vllm_engines: Dict[str, Any] = {}
+_vllm_engine_lock = asyncio.Lock()
+
+def _create_vllm_engine(model: str) -> Any:
+    # Optional dependency, only needed for the 'vllm' provider
+    from vllm import AsyncEngineArgs, AsyncLLMEngine
+    return AsyncLLMEngine.from_engine_args(AsyncEngineArgs(
+        model=model,
+        max_num_batched_tokens=8192,
+        gpu_memory_utilization=VLLM_GPU_MEMORY_UTILIZATION / len(VLLM_MODELS),
+    ))
+
+async def _get_vllm_engine(model: str) -> Any:
+    """Returns the engine for an allowed local model, loading it in a worker thread if needed."""
+    if model not in VLLM_MODELS:
+        raise ValueError(f"Model '{model}' is not enabled for the vllm provider (see VLLM_MODELS).")
+    if model not in _vllm_engines:
+        # Loading weights takes a while; the lock keeps concurrent callers from
+        # starting a second engine, and the thread keeps the event loop responsive.
+        async with _vllm_engine_lock:
+            if model not in _vllm_engines:
+                _vllm_engines[model] = await asyncio.to_thread(_create_vllm_engine, model)
+    return _vllm_engines[model]
+
+def _log_vllm_preload_failure(model: str, task: asyncio.Task) -> None:
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Failed to load vLLM model '%s'", model, exc_info=task.exception())
+
+def _start_vllm_preload() -> List[asyncio.Task]:
+    """Starts loading every configured vLLM model in the background."""
+    tasks = []
+    for model in VLLM_MODELS:
+        task = asyncio.create_task(_get_vllm_engine(model))
+        task.add_done_callback(functools.partial(_log_vllm_preload_failure, model))
+        tasks.append(task)
+    return tasks
+
+class VLLMEngineLLM:
+    """Runs prompts on an in-process vLLM engine.
+
+    Concurrent calls (e.g. from a batch run) are continuously batched by the
+    engine, so the GPU processes many prompts per forward pass.
+    """
+
+    def __init__(self, model: str, temperature: float):
+        self.model = model
+        self.temperature = temperature
+
+    async def acomplete(self, prompt: str) -> CompletionResponse:
+        from vllm import SamplingParams
+        engine = await _get_vllm_engine(self.model)
+        params = SamplingParams(temperature=self.temperature, max_tokens=8192)
+        final = None
+        async for output in engine.generate(prompt, params, request_id=str(uuid.uuid4())):
+            final = output
+        return CompletionResponse(text=final.outputs[0].text if final else "")
+
+    async def astructured_predict(self, output_cls: type[BaseModel], prompt: PromptTemplate) -> BaseModel:
+        raise ValueError("Structured parsing is not supported with the vllm provider; use the raw or python parser.")
+
+@functools.lru_cache(maxsize=32)
+def _get_llm(provider: str, model: str, temperature: float) -> Any:
+    """Returns a shared LLM client so connection pools are reused across calls."""
+    if provider == "openai":
+        http_client = httpx.AsyncClient(limits=httpx.Limits(max_connections=256, max_keepalive_connections=256))
+        return OpenAI(model=model, temperature=temperature, timeout=180, async_http_client=http_client)
+    elif provider == "anthropic":
+        return Anthropic(model=model, temperature=temperature, max_tokens=8192, timeout=180)
+    elif provider == "google":
+        return GoogleGenAI(model=model, temperature=temperature, timeout=180)
+    elif provider == "vllm":
+        if model not in VLLM_MODELS:
+            raise ValueError(f"Model '{model}' is not enabled for the vllm provider (see VLLM_MODELS).")
+        return VLLMEngineLLM(model=model, temperature=temperature)
+    else:
+        raise ValueError(f"Unsupported LLM provider: {provider}")
+
+async def prepare_batch_context(request: RunRequest, for_batch: bool = False) -> PreparedRun:
+    """Resolves the template, global bindings, LLM client and parser once per run or batch."""
     # 1. Get Template Content
     if request.template_id:
         template_file = _find_template_file(request.template_id)
         if not template_file:
             raise ValueError("Template not found")
-        template_content = template_file.read_text()
+        template_data = await asyncio.to_thread(_read_json_file, template_file)
+        template_content = template_data.get("content", "")
     else:
         template_content = request.template_text or ""
 
-    # 2. Build Context
-    context = {}
+    # 2. Resolve bindings; record-scoped values are filled in per record
+    context_parts = []
     for binding in request.datasource_bindings:
         dataset_file = _find_dataset_file(binding.source_id)
         if not dataset_file:
             raise ValueError(f"Dataset with ID {binding.source_id} not found.")
 
-        context_key = binding.context_key
-
         if binding.scope == "global":
-            data = _load_dataset_file(dataset_file)
             row = binding.row or 0
-            if not (0 <= row < len(data)):
+            context_value = await asyncio.to_thread(_get_dataset_row, dataset_file, row)
+            if context_value is None:
                 raise ValueError("Invalid row index for global binding.")
-            context_value = data[row]
-        else: # record scope
-            if record:
-                context_value = record
-            elif request.selected_record:
-                context_value = request.selected_record
-            else:
-                # For a single run, we assume the first record is used for any 'record' scoped datasets
-                data = _load_dataset_file(dataset_file)
-                if data:
-                    context_value = data[0]
+        elif for_batch:
+            # Every batch record supplies its own value
+            context_value = None
+        elif request.selected_record:
+            context_value = request.selected_record
+        else:
+            # For a single run, we assume the first record is used for any 'record' scoped datasets
+            context_value = await asyncio.to_thread(_get_dataset_row, dataset_file, 0)
+
+        context_parts.append((binding.context_key, binding.scope, context_value))
 
+    # 3. Compile user parser code off the event loop
+    parser_spec = request.parser or ParserSpec()
+    output_model = None
+    parse_func = None
+    if parser_spec.type == "structured" and parser_spec.pydantic_model:
+        output_model = await asyncio.to_thread(create_model_from_string, parser_spec.pydantic_model)
+    elif parser_spec.type == "python" and parser_spec.python_code:
+        parse_func = await asyncio.to_thread(_compile_parser, parser_spec.python_code)
+
+    llm_config = request.llm or LLMConfig()
+    return PreparedRun(
+        template_content=template_content,
+        template=_compile_template(template_content),
+        context_parts=context_parts,
+        llm=_get_llm(llm_config.provider, llm_config.model, llm_config.temperature),
+        output_model=output_model,
+        parse_func=parse_func,
+    )
+
+async def execute_prepared(prepared: PreparedRun, record: Dict[str, Any] | None) -> Dict[str, Any]:
+    """Renders the prepared template for one record, calls the LLM and parses the response."""
+    # 1. Merge the record into the prepared context
+    context = {}
+    for context_key, scope, context_value in prepared.context_parts:
+        if scope == "record" and record is not None:
+            context_value = record
         if context_key == '' and isinstance(context_value, dict):
             context = { **context, **context_value }
         else:
             context[context_key] = context_value
 
-    # 3. Render Prompt
-    jinja_env = jinja2.Environment()
-    jinja_env.filters['numlines'] = lambda value: '\n'.join([f"{i+1}: {line}" for i, line in enumerate(value.split('\n'))])
-    template = jinja_env.from_string(template_content)
-    prompt = template.render(context)
-
-    # 4. Execute LLM & Parse
-    if request.llm.provider == "openai":
-        llm = OpenAI(model=request.llm.model, temperature=request.llm.temperature, timeout=180)
-    elif request.llm.provider == "anthropic":
-        llm = Anthropic(model=request.llm.model, temperature=request.llm.temperature, max_tokens=8192, timeout=180)
-    elif request.llm.provider == "google":
-        llm = GoogleGenAI(model=request.llm.model, temperature=request.llm.temperature, timeout=180)
-    else:
-        raise ValueError(f"Unsupported LLM provider: {request.llm.provider}")
+    # 2. Render Prompt
+    prompt = await _render_prompt(prepared, context)
 
-    parser_spec = request.parser or ParserSpec()
+    # 3. Execute LLM & Parse
+    llm = prepared.llm
 
-    if parser_spec.type == "structured" and parser_spec.pydantic_model:
+    await _throttle_llm_call()
+
+    if prepared.output_model is not None:
         try:
-            DynamicModel = create_model_from_string(parser_spec.pydantic_model)
-            parsed_response = llm.structured_predict(DynamicModel, PromptTemplate(prompt))
+            parsed_response = await llm.astructured_predict(prepared.output_model, PromptTemplate(prompt))
             raw_response = str(parsed_response)
             if isinstance(parsed_response, BaseModel):
-                parsed_response = parsed_response.model_dump(exclude_none=True)
+                parsed_response = parsed_response.model_dump(mode="json", exclude_none=True)
             else:
                 parsed_response = raw_response
             # pydantic_parser = PydanticOutputParser(DynamicModel)
@@ -449,44 +897,91 @@ def execute_llm_run(request: RunRequest, record: Dict[str, Any] | None) -> Dict[
             import traceback
             traceback.print_exc()
             raise ValueError(f"Pydantic model parsing failed: {e}")
-    elif parser_spec.type == "python" and parser_spec.python_code:
-        raw_response = llm.complete(prompt).text
+    elif prepared.parse_func is not None:
+        raw_response = (await llm.acomplete(prompt)).text
         try:
-            parsed_response = execute_custom_python(parser_spec.python_code, raw_response)
+            parsed_response = await asyncio.to_thread(execute_custom_python, prepared.parse_func, raw_response)
         except Exception as e:
             raise ValueError(f"Custom Python parsing failed: {e}")
     else: # Raw
-        raw_response = llm.complete(prompt).text
+        raw_response = (await llm.acomplete(prompt)).text
         parsed_response = raw_response
 
     return {"raw_response": raw_response, "parsed_response": parsed_response}
 
+async def execute_llm_run(request: RunRequest, record: Dict[str, Any] | None) -> Dict[str, Any]:
+    prepared = await prepare_batch_context(request)
+    return await execute_prepared(prepared, record)
+
+@functools.lru_cache(maxsize=256)
+def _compile_template(template_content: str) -> jinja2.Template:
+    """Compiles template source once and reuses it for identical content."""
+    return JINJA_ENV.from_string(template_content)
+
+_render_executor: concurrent.futures.ProcessPoolExecutor | None = None
+
+def _render(template_content: str, context: Dict[str, Any]) -> str:
+    """Renders a template; module-level so it can be run in a worker process."""
+    return _compile_template(template_content).render(context)
+
+async def _render_prompt(prepared: PreparedRun, context: Dict[str, Any]) -> str:
+    """Renders the prompt, in the render process pool when RENDER_WORKERS is set."""
+    global _render_executor
+    if RENDER_WORKERS <= 0:
+        return prepared.template.render(context)
+    if _render_executor is None:
+        _render_executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=RENDER_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_render_executor, _render, prepared.template_content, context)
+
+# --- User Code Execution ---
+
+# User-supplied model and parser code is not sandboxed: it runs with the module
+# globals and full builtins, as before. Each snippet is compiled once and gets its
+# own copy of the globals, so its top-level definitions are visible to each other
+# without leaking into the app's namespace.
+@functools.lru_cache(maxsize=128)
+def _compile_user_code(code: str, filename: str) -> CodeType:
+    return compile(code, filename, "exec")
+
+def _exec_user_code(code: str, filename: str) -> Dict[str, Any]:
+    """Runs a snippet and returns the names it defined."""
+    app_globals = globals()
+    namespace = dict(app_globals)
+    exec(_compile_user_code(code, filename), namespace)
+    return {name: value for name, value in namespace.items() if app_globals.get(name) is not value}
+
+@functools.lru_cache(maxsize=128)
 def create_model_from_string(model_code: str) -> type[BaseModel]:
     """Dynamically creates a Pydantic model from a string of Python code."""
-    local_scope = {}
     try:
-        exec(model_code, globals(), local_scope)
+        defined = _exec_user_code(model_code, "<model>")
     except Exception as e:
         raise ValueError(f"Invalid Pydantic model definition: {e}")
 
-    for name, value in local_scope.items():
+    for name, value in defined.items():
         if isinstance(value, type) and issubclass(value, BaseModel) and value is not BaseModel and not name.startswith("_"):
             return value
 
     raise ValueError("No Pydantic model class found in the provided code. Make sure to define a class that inherits from pydantic.BaseModel.")
 
-def execute_custom_python(code: str, text_input: str) -> Any:
-    """Executes a custom Python parsing function."""
-    local_scope = {}
+@functools.lru_cache(maxsize=128)
+def _compile_parser(code: str) -> Callable[[str], Any]:
+    """Compiles custom parsing code once and returns its 'parse' function."""
     try:
-        exec(code, globals(), local_scope)
+        defined = _exec_user_code(code, "<parser>")
     except Exception as e:
         raise ValueError(f"Invalid Python code for parsing: {e}")
 
-    parser_func = local_scope.get("parse")
+    parser_func = defined.get("parse")
     if not callable(parser_func):
         raise ValueError("A 'parse' function was not found in the provided code.")
+    return parser_func
 
+def execute_custom_python(parser_func: Callable[[str], Any], text_input: str) -> Any:
+    """Executes a compiled custom Python parsing function."""
     try:
         return parser_func(text_input)
     except Exception as e:
@@ -495,14 +990,16 @@ def execute_custom_python(code: str, text_input: str) -> Any:
 @app.post("/api/llm/run", response_model=RunResponse)
 async def run_llm(request: RunRequest):
     try:
-        result = execute_llm_run(request, None)
+        result = await execute_llm_run(request, None)
         return RunResponse(**result)
     except (ValueError, HTTPException) as e:
         return RunResponse(raw_response="", error=str(e))
 
 # Background task for batch processing
-def batch_process_task(job_id: str, request: BatchRunRequest):
-    job_store[job_id] = {"status": "running", "progress": 0, "total": 0, "results": [], "error": None}
+async def batch_process_task(job_id: str, request: BatchRunRequest):
+    results_path = PARTIAL_RESULTS_DIR / f"{job_id}.jsonl"
+    await job_store.set(job_id, {"status": "running", "progress": 0, "total": 0, "results_path": str(results_path), "error": None})
+    in_progress: Dict[int, asyncio.Task] = {}
 
     try:
         # Identify record-scoped dataset
@@ -514,68 +1011,130 @@ def batch_process_task(job_id: str, request: BatchRunRequest):
         if not record_dataset_file:
             raise ValueError(f"Record-scoped dataset {record_scoped_binding.source_id} not found.")
 
-        record_data = _load_dataset_file(record_dataset_file)
+        prepared = await prepare_batch_context(request, for_batch=True)
+        record_data = await asyncio.to_thread(_load_dataset_file, record_dataset_file)
         total_records = len(record_data)
-        job_store[job_id]["total"] = total_records
+        await job_store.update(job_id, total=total_records)
+
+        # Keep at most BATCH_CONCURRENCY requests in flight, refilling as each one finishes.
+        # Results are written in input order, so lines match the dataset row-for-row;
+        # finished-but-unwritten results wait in `completed`. Submission stops while
+        # more than `max_ahead` records are unwritten, which bounds that buffer if one
+        # record is slow.
+        max_ahead = 4 * BATCH_CONCURRENCY
+        completed: Dict[int, bytes] = {}
+        next_index = 0
+        next_to_write = 0
+
+        # Progress is batched to save job store round-trips (one per record under Redis)
+        unflushed_progress = 0
+        last_flush = time.monotonic()
+
+        with results_path.open("ab") as results_file:
+            while next_index < total_records or in_progress:
+                while (next_index < total_records and len(in_progress) < BATCH_CONCURRENCY
+                        and next_index - next_to_write < max_ahead):
+                    record = record_data[next_index]
+                    in_progress[next_index] = asyncio.create_task(execute_prepared(prepared, record))
+                    next_index += 1
+
+                done, _ = await asyncio.wait(in_progress.values(), return_when=asyncio.FIRST_COMPLETED)
+                for i in [i for i, task in in_progress.items() if task in done]:
+                    task = in_progress.pop(i)
+                    record = record_data[i]
+                    try:
+                        line = orjson.dumps({"input_record": record, **task.result()}, option=orjson.OPT_NON_STR_KEYS)
+                    except Exception as e:
+                        line = orjson.dumps({"input_record": record, "error": str(e)}, option=orjson.OPT_NON_STR_KEYS)
+                    completed[i] = line
+                    unflushed_progress += 1
+
+                while next_to_write in completed:
+                    results_file.write(completed.pop(next_to_write) + b"\n")
+                    next_to_write += 1
+
+                if (unflushed_progress >= PROGRESS_FLUSH_EVERY
+                        or time.monotonic() - last_flush >= PROGRESS_FLUSH_INTERVAL):
+                    await job_store.incr(job_id, "progress", unflushed_progress)
+                    unflushed_progress = 0
+                    last_flush = time.monotonic()
+
+        if unflushed_progress:
+            await job_store.incr(job_id, "progress", unflushed_progress)
+
+        await job_store.update(job_id, status="completed")
+
+    except Exception as e:
+        await job_store.update(job_id, status="failed", error=str(e))
+        # Results of failed jobs can't be downloaded or saved, so don't keep them around
+        results_path.unlink(missing_ok=True)
+
+    finally:
+        # If the loop stopped early, don't leave requests running for a dead job
+        for task in in_progress.values():
+            task.cancel()
+        await asyncio.gather(*in_progress.values(), return_exceptions=True)
 
-        for i, record in enumerate(record_data):
-            try:
-                result = execute_llm_run(request, record)
-                job_store[job_id]["results"].append({"input_record": record, **result})
-            except Exception as e:
-                job_store[job_id]["results"].append({"input_record": record, "error": str(e)})
 
-            job_store[job_id]["progress"] = i + 1
-            time.sleep(0.1) # Simulate work
+def _cleanup_partial_results() -> None:
+    """Deletes unsaved job results older than JOB_TTL_SECONDS."""
+    cutoff = time.time() - JOB_TTL_SECONDS
+    for f in PARTIAL_RESULTS_DIR.iterdir():
+        try:
+            if f.stat().st_mtime < cutoff:
+                f.unlink()
+        except OSError:
+            continue
 
-        job_store[job_id]["status"] = "completed"
 
-    except Exception as e:
-        job_store[job_id]["status"] = "failed"
-        job_store[job_id]["error"] = str(e)
+def _job_results_path(job: Dict[str, Any]) -> Path:
+    """Returns a completed job's results file, or raises if it has been cleaned up."""
+    results_path = Path(job["results_path"])
+    if not results_path.is_file():
+        if results_path.parent == PARTIAL_RESULTS_DIR:
+            raise HTTPException(status_code=410, detail="Job results have expired.")
+        raise HTTPException(status_code=404, detail="Job results file not found.")
+    return results_path
 
 
 @app.post("/api/llm/batch", response_model=BatchRunResponse)
 async def run_batch(request: BatchRunRequest, background_tasks: BackgroundTasks):
     job_id = str(uuid.uuid4())
+    await asyncio.to_thread(_cleanup_partial_results)
     background_tasks.add_task(batch_process_task, job_id, request)
     return BatchRunResponse(job_id=job_id)
 
 @app.get("/api/jobs/{job_id}/status", response_model=JobStatus)
 async def get_job_status(job_id: str):
-    job = job_store.get(job_id)
+    job = await job_store.get(job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
-    return JobStatus(status=job["status"], progress=job["progress"], total=job["total"], error=job["error"])
+    return JobStatus(
+        status=job.get("status", "running"),
+        progress=job.get("progress", 0),
+        total=job.get("total", 0),
+        error=job.get("error"),
+    )
 
 @app.get("/api/jobs/{job_id}/results")
 async def get_job_results(job_id: str):
-    job = job_store.get(job_id)
+    job = await job_store.get(job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
-    if job["status"] != "completed":
+    if job.get("status") != "completed":
         raise HTTPException(status_code=400, detail="Job is not yet complete.")
 
-    # Create a JSONL string from the results
-    jsonl_content = ""
-    for item in job["results"]:
-        jsonl_content += json.dumps(item) + "\n"
-
-    # Return as downloadable file
-    return Response(
-        content=jsonl_content,
-        media_type="application/jsonl",
-        headers={
-            "Content-Disposition": f"attachment; filename=job_{job_id}.jsonl"
-        }
-    )
+    results_path = _job_results_path(job)
+
+    # Serve the JSONL file directly; the server can use sendfile for this
+    return FileResponse(results_path, media_type="application/jsonl", filename=f"job_{job_id}.jsonl")
 
 @app.post("/api/jobs/save")
 async def save_job_results(request: SaveResultsRequest):
-    job = job_store.get(request.job_id)
+    job = await job_store.get(request.job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
-    if job["status"] != "completed":
+    if job.get("status") != "completed":
         raise HTTPException(status_code=400, detail="Job is not yet complete.")
 
     # Sanitize filename
@@ -583,15 +1142,22 @@ async def save_job_results(request: SaveResultsRequest):
         raise HTTPException(status_code=400, detail="Filename cannot contain slashes.")
 
     file_path = RESULTS_DIR / f"{request.filename}.jsonl"
-
-    if file_path.exists():
-        raise HTTPException(status_code=409, detail="A file with that name already exists.")
+    source_path = _job_results_path(job)
 
     try:
-        with file_path.open("w") as f:
-            for item in job["results"]:
-                f.write(json.dumps(item) + "\n")
-    except IOError as e:
+        if source_path.parent == PARTIAL_RESULTS_DIR:
+            # First save: results are already on disk, so just move them into place
+            await asyncio.to_thread(_move_no_overwrite, source_path, file_path)
+            await job_store.update(request.job_id, results_path=str(file_path))
+        else:
+            # Already saved under another name; keep that file and write a copy
+            await asyncio.to_thread(_copy_no_overwrite, source_path, file_path)
+    except FileExistsError:
+        raise HTTPException(status_code=409, detail="A file with that name already exists.")
+    except FileNotFoundError:
+        # The results were cleaned up or moved by a concurrent save after the check above
+        raise HTTPException(status_code=410, detail="Job results have expired.")
+    except OSError as e:
         raise HTTPException(status_code=500, detail=f"Failed to save results to disk: {e}")
 
     return {"message": "Results saved successfully", "path": str(file_path)}